@@ -1,12 +1,22 @@
 import streamlit as st
 import yfinance as yf
 import pandas as pd
-import matplotlib.pyplot as plt
 import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.subplots import make_subplots
 import numpy as np
 from datetime import datetime
 import requests
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
+import re
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# Serialize figures with orjson, which encodes NumPy arrays natively
+pio.json.config.default_engine = "orjson"
 
 # Expanded dictionary mapping for Indian indices
 index_mapping = {
@@ -15,193 +25,323 @@ index_mapping = {
     "BSE SENSEX": "^BSESN"
 }
 
+# Tickers that already carry an exchange suffix (.NS, .BO) or are indices (^)
+HAS_EXCHANGE = re.compile(r"[.^]").search
+
+# Minimum query length before we hit the search API
+MIN_QUERY_LENGTH = 3
+
+# Number of quotes requested per search; fewer back means the list is complete
+SEARCH_QUOTES_COUNT = 10
+
+# Charts are only ~1000px wide, so long histories are downsampled to this
+MAX_PLOT_POINTS = 2000
+
+# Below this many rows SVG traces are fast enough and render crisper than WebGL
+SCATTERGL_MIN_ROWS = 1000
+
+# Shared HTTP session so repeated lookups reuse keep-alive connections
+@st.cache_resource
+def get_http_session():
+    session = requests.Session()
+    session.headers.update({"User-Agent": "Mozilla/5.0"})
+    # Retry transient failures and rate limits on the pooled connection
+    # A read timeout is not retried and Retry-After is not honoured, so one
+    # stalled search cannot hold the request well past its own timeout
+    retries = Retry(
+        total=3,
+        read=0,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=False
+    )
+    adapter = HTTPAdapter(max_retries=retries, pool_connections=4, pool_maxsize=16)
+    session.mount("https://", adapter)
+    return session
+
 # Function to fetch ticker suggestions from Yahoo Finance
-@st.cache_data(ttl=60)  # Cache results for 1 minute - shorter to be more responsive
+# Returns the suggestions and whether Yahoo sent back every match it had
+# Errors are raised rather than returned so a failed lookup is never cached
+@st.cache_data(ttl=3600, max_entries=512, show_spinner=False)  # Cache results for 1 hour
 def get_ticker_suggestions(query):
-    url = f"https://query2.finance.yahoo.com/v1/finance/search?q={query}"
-    headers = {"User-Agent": "Mozilla/5.0"}
+    if len(query) < MIN_QUERY_LENGTH:
+        return [], False
+    url = (
+        f"https://query2.finance.yahoo.com/v1/finance/search"
+        f"?q={query}&quotesCount={SEARCH_QUOTES_COUNT}"
+    )
     
+    response = get_http_session().get(url, timeout=5)
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    quotes = data.get("quotes", [])
+    # Filter to only include Indian stocks (.NS, .BO) and indices (^)
+    suggestions = []
+    for item in quotes:
+        symbol = item["symbol"]
+        name = item.get("shortname", "Unknown")
+        if symbol.endswith(".NS") or symbol.endswith(".BO") or symbol.startswith("^"):
+            suggestions.append((symbol, name))
+    return suggestions, len(quotes) < SEARCH_QUOTES_COUNT
+
+# Function to map user input to a Yahoo ticker, adding .NS for bare NSE symbols
+def resolve_ticker(user_ticker):
+    ticker = index_mapping.get(user_ticker, user_ticker)
+    if not HAS_EXCHANGE(ticker):
+        ticker += ".NS"
+    return ticker
+
+# Function to download price history, cached so reruns skip the network
+# yf.download shares module-level state between calls, so a Ticker object is
+# used instead, which keeps the function safe to call from worker threads
+# yfinance reports failures as an empty frame; raising instead keeps a
+# transient error or rate limit out of the cache
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)  # Cache results for 1 hour
+def download_history(ticker):
+    history = yf.Ticker(ticker).history(period="max")
+    if history.empty:
+        raise ValueError(f"No price data returned for {ticker}")
+    return history
+
+# Function to fetch one ticker's history, with a failed download coming back
+# as an empty frame so it is reported per ticker
+def load_history(ticker):
     try:
-        response = requests.get(url, headers=headers)
-        data = response.json()
-        # Filter to only include Indian stocks (.NS, .BO) and indices (^)
-        suggestions = []
-        for item in data.get("quotes", []):
-            symbol = item["symbol"]
-            name = item.get("shortname", "Unknown")
-            if symbol.endswith(".NS") or symbol.endswith(".BO") or symbol.startswith("^"):
-                suggestions.append((symbol, name))
-        return suggestions
-    except Exception as e:
-        st.error(f"Error fetching suggestions: {e}")
-        return []
+        return download_history(ticker)
+    except Exception:
+        return pd.DataFrame()
+
+# Function to download several price histories concurrently
+# Workers share the per-ticker cache with single lookups and carry the script
+# context so the cached calls work off the main thread
+def download_many(tickers):
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(
+        max_workers=min(8, len(tickers)),
+        initializer=add_script_run_ctx,
+        initargs=(None, ctx)
+    ) as executor:
+        return dict(zip(tickers, executor.map(load_history, tickers)))
+
+# Function to downsample a series with Largest-Triangle-Three-Buckets (LTTB)
+# Returns the row positions to keep, always including the first and last row
+def lttb_indices(x, y, n_out=MAX_PLOT_POINTS):
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets between the fixed first and last points
+    bounds = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        # Average of the next bucket (just the last point for the final bucket)
+        next_hi = bounds[i + 2] if i + 2 < len(bounds) else n
+        avg_x = x[hi:next_hi].mean()
+        avg_y = y[hi:next_hi].mean()
+
+        # Keep the point forming the largest triangle with the previous pick
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        selected[i + 1] = a
+
+    return selected
+
+# Function to build the outline of all drawdown periods as one SVG path
+# Each period is a closed rectangle over the full height of its subplot
+def drawdown_band_path(start_dates, end_dates):
+    # Plotly path strings separate date and time with an underscore
+    starts = start_dates.strftime('%Y-%m-%d_%H:%M:%S')
+    ends = end_dates.strftime('%Y-%m-%d_%H:%M:%S')
+    return "".join("M" + starts + ",0V1H" + ends + "V0Z")
+
+# Function to draw a precomputed band path as one shape beneath the data
+def drawdown_bands(path, fillcolor, xref, yref):
+    return dict(
+        type="path",
+        path=path,
+        xref=xref,
+        yref=yref,
+        fillcolor=fillcolor,
+        line=dict(width=0),
+        layer="below"
+    )
+
+# Function to compute the drawdown figure and statistics table for a ticker
+# Cached as a resource, so reruns for an unchanged ticker skip the whole build
+@st.cache_resource(ttl=3600, max_entries=32, show_spinner=False)
+def build_analysis(ticker, stock_data):
+    # Process the data as plain arrays; no intermediate DataFrame is needed
+    # fmax skips missing closes like cummax does
+    # float32 keeps ~7 significant digits, plenty for percentage drawdowns
+    idx = stock_data.index
+    closes = stock_data['Close'].to_numpy(dtype=np.float32).ravel()
+    ath = np.fmax.accumulate(closes)
+    drawdown = (closes - ath) / ath
 
-# Function to analyze stock data
-def analyze_stock(ticker):
-    st.write(f"**Using Ticker:** {ticker}")
-    
-    with st.spinner("Downloading data..."):
-        stock_data = yf.download(ticker, period="max")
-    
-    if stock_data.empty:
-        st.error("Error: Invalid ticker or no data available.")
-        return
-    
-    st.success(f"Downloaded {len(stock_data)} rows of data.")
-    
-    # Process the data
-    df = stock_data[['Close']].copy()
-    close_series = df['Close'].squeeze()
-    df['ATH'] = close_series.cummax()
-    df['Drawdown'] = (close_series - df['ATH']) / df['ATH']
-    
     # Define drawdown threshold
     threshold = -0.25
-    df['In_Drawdown'] = df['Drawdown'] <= threshold
-    
-    # Simple way to get drawdown periods
-    drawdown_periods = []
-    in_drawdown = False
-    start_date = None
-    
-    for date, value in df['In_Drawdown'].items():
-        if value and not in_drawdown:
-            # Start of a drawdown period
-            in_drawdown = True
-            start_date = date
-        elif not value and in_drawdown:
-            # End of a drawdown period
-            in_drawdown = False
-            drawdown_periods.append((start_date, date))
-            start_date = None
-    
-    # If still in drawdown at the end
-    if in_drawdown:
-        drawdown_periods.append((start_date, df.index[-1]))
-    
-    # Create price chart with Matplotlib
-    fig1, ax1 = plt.subplots(figsize=(12, 6))
-    
+    in_dd = drawdown <= threshold
+
+    # Find drawdown periods from the edges of the boolean mask
+    # +1 marks the start of a period, -1 the first row after it ends
+    # Viewing the bools as int8 reinterprets the buffer instead of copying it,
+    # and int8 padding keeps the whole pass in 1-byte elements
+    zero = np.int8(0)
+    edges = np.diff(in_dd.view(np.int8), prepend=zero, append=zero)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    # If still in drawdown at the end, the closing edge falls past the last row
+    ends = np.minimum(ends, len(idx) - 1)
+    start_dates, end_dates = idx[starts], idx[ends]
+
+    # Downsample long histories for plotting; the full series is kept for stats
+    # LTTB only compares triangle areas, so the index unit does not matter
+    x_pos = idx.asi8.astype(np.float64)
+    close_rows = lttb_indices(x_pos, closes)
+    ath_rows = lttb_indices(x_pos, ath)
+    drawdown_rows = lttb_indices(x_pos, drawdown)
+
+    # Price and drawdown share one figure and one x-axis
+    line_trace = go.Scattergl if len(idx) > SCATTERGL_MIN_ROWS else go.Scatter
+    fig = make_subplots(
+        rows=2,
+        cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.08,
+        row_heights=[0.55, 0.45],
+        subplot_titles=(f"{ticker} Price and All-Time High", f"{ticker} Drawdowns")
+    )
+
     # Plot price and ATH
-    ax1.plot(df.index, df['Close'], label='Close Price', color='blue')
-    ax1.plot(df.index, df['ATH'], label='All-Time High', color='green', linestyle='--')
-    
-    # Highlight drawdown periods
-    for start, end in drawdown_periods:
-        ax1.axvspan(start, end, alpha=0.2, color='red')
-    
-    # Set labels and title
-    ax1.set_title(f"{ticker} Price and All-Time High")
-    ax1.set_xlabel("Date")
-    ax1.set_ylabel("Price")
-    ax1.legend()
-    ax1.grid(True, alpha=0.3)
-    
-    # Add some padding to x-axis
-    # For price chart (less padding)
-    date_range = df.index[-1] - df.index[0]
-    padding = pd.Timedelta(days=int(date_range.days * 0.02))  # 2% padding
-    ax1.set_xlim(df.index[0] - padding, df.index[-1] + padding)
-    
-    # Adjust layout for better display
-    plt.tight_layout(pad=2.0)  # Increase padding around the plot
-    
-    # Display the Matplotlib chart with full width
-    st.pyplot(fig1, use_container_width=True)
-    
-    # Create drawdown chart with Plotly
-    fig2 = go.Figure()
-    
+    fig.add_trace(line_trace(
+        x=idx[close_rows],
+        y=closes[close_rows],
+        mode='lines',
+        name='Close Price',
+        line=dict(color='blue')
+    ), row=1, col=1)
+    fig.add_trace(line_trace(
+        x=idx[ath_rows],
+        y=ath[ath_rows],
+        mode='lines',
+        name='All-Time High',
+        line=dict(color='green', dash='dash')
+    ), row=1, col=1)
+
     # Add drawdown percentage
-    fig2.add_trace(go.Scatter(
-        x=df.index, 
-        y=df['Drawdown'] * 100, 
+    fig.add_trace(line_trace(
+        x=idx[drawdown_rows], 
+        y=drawdown[drawdown_rows] * 100, 
         mode='lines', 
         name='Drawdown (%)', 
         line=dict(color='red')
-    ))
+    ), row=2, col=1)
     
-    # Add threshold line
-    fig2.add_trace(go.Scatter(
-        x=df.index, 
-        y=[threshold * 100] * len(df), 
-        mode='lines', 
-        name='Threshold (-25%)', 
-        line=dict(color='red', dash='dash')
-    ))
+    # Add threshold line as a layout shape, no per-point data needed
+    fig.add_hline(
+        y=threshold * 100,
+        line=dict(color='red', dash='dash'),
+        annotation_text='Threshold (-25%)',
+        row=2,
+        col=1
+    )
     
-    # Add shaded regions for drawdown periods
-    for start, end in drawdown_periods:
-        fig2.add_shape(
-            type="rect",
-            x0=start,
-            x1=end,
-            y0=0,
-            y1=1,
-            xref="x",
-            yref="paper",
-            fillcolor="rgba(255, 0, 0, 0.1)",
-            line=dict(width=0),
-            layer="below"
-        )
+    # Highlight drawdown periods on both rows, sharing one band path
+    if len(starts):
+        band_path = drawdown_band_path(start_dates, end_dates)
+        fig.add_shape(drawdown_bands(band_path, "rgba(255, 0, 0, 0.2)", "x", "y domain"))
+        fig.add_shape(drawdown_bands(band_path, "rgba(255, 0, 0, 0.1)", "x2", "y2 domain"))
     
-    # Update layout for drawdown chart (more padding on right)
-    fig2.update_layout(
-        title=f"{ticker} Drawdowns",
-        xaxis_title="Date",
-        yaxis_title="Drawdown (%)",
+    # Update layout
+    fig.update_layout(
         template="plotly_white",
-        hovermode="x unified",
-        height=450,
+        hovermode="x unified",  # Cheap, as LTTB caps every trace at MAX_PLOT_POINTS
+        spikedistance=0,  # No spike lines are drawn, so skip their data lookup
+        height=800,
+        uirevision=ticker,  # Keep the user's zoom/pan while the ticker is unchanged
         legend=dict(
             orientation="h",
             yanchor="bottom",
-            y=1.02,
+            y=1.04,
             xanchor="right",
             x=1
         ),
-        margin=dict(l=50, r=0, t=50, b=50),  # Added left margin for y-axis label
-        yaxis=dict(
+        margin=dict(l=50, r=0, t=80, b=50),  # Added left margin for y-axis label
+        yaxis=dict(title="Price"),
+        yaxis2=dict(
             title=dict(
                 text="Drawdown (%)",
                 standoff=0  # Adjust the distance of the label from the axis
             )
         ),
-        xaxis=dict(
-            range=[df.index[0] - padding, df.index[-1] + padding * 2],
+        xaxis2=dict(
+            title="Date",
             rangeslider=dict(visible=False)
         )
     )
+
+    # Statistics table, only when there is at least one drawdown period
+    if len(starts) == 0:
+        return fig, None
+
+    # Minimum of each segment [start_i, start_i+1) in one reduction; rows
+    # between periods sit above the threshold so they never win the min
+    max_drawdowns = np.fmin.reduceat(drawdown, starts) * 100
+
+    # Durations in whole days from one vectorized index subtraction
+    durations = (end_dates - start_dates).days
+
+    # Build the statistics table in one go
+    # Numbers stay numeric; the "%" and "days" units are added at display time
+    stats_df = pd.DataFrame({
+        "Start Date": start_dates.strftime('%Y-%m-%d'),
+        "End Date": np.where(ends == len(idx) - 1, "Ongoing", end_dates.strftime('%Y-%m-%d')),
+        "Max Drawdown": max_drawdowns,
+        "Duration": durations
+    })
+
+    return fig, stats_df
+
+# Function to analyze stock data
+def analyze_stock(ticker, stock_data=None):
+    st.write(f"**Using Ticker:** {ticker}")
+    
+    if stock_data is None:
+        with st.spinner("Downloading data..."):
+            stock_data = load_history(ticker)
+    
+    if stock_data.empty:
+        st.error("Error: Invalid ticker or no data available.")
+        return
+    
+    st.success(f"Downloaded {len(stock_data)} rows of data.")
     
+    fig, stats_df = build_analysis(ticker, stock_data)
+
     # Display the Plotly chart with full width
-    st.plotly_chart(fig2, use_container_width=True)
+    st.plotly_chart(fig, use_container_width=True, config={"scrollZoom": True})
     
     # Display drawdown statistics
-    if drawdown_periods:
+    if stats_df is not None:
         st.subheader("Major Drawdown Periods (Below -25%)")
-        
-        # Create a list to store drawdown statistics
-        stats_data = []
-        
-        for start, end in drawdown_periods:
-            # Get data for this period
-            mask = (df.index >= start) & (df.index <= end)
-            period_df = df[mask]
-            
-            # Calculate statistics
-            max_drawdown = period_df['Drawdown'].min() * 100
-            duration = (end - start).days
-            
-            # Add to statistics
-            stats_data.append({
-                "Start Date": start.strftime('%Y-%m-%d'),
-                "End Date": end.strftime('%Y-%m-%d') if end != df.index[-1] else "Ongoing",
-                "Max Drawdown": f"{max_drawdown:.2f}%",
-                "Duration": f"{duration} days"
-            })
-        
-        # Display statistics as a table
-        st.table(pd.DataFrame(stats_data))
+        st.dataframe(
+            stats_df,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "Max Drawdown": st.column_config.NumberColumn(format="%.2f%%"),
+                "Duration": st.column_config.NumberColumn(format="%d days")
+            }
+        )
 
 # Custom CSS for better suggestion display
 st.markdown("""
@@ -237,8 +377,12 @@ def init_session_state():
         st.session_state.suggestions = []
     if 'last_search_time' not in st.session_state:
         st.session_state.last_search_time = 0
+    if 'prefix_cache' not in st.session_state:
+        st.session_state.prefix_cache = {}
     if 'analyze_flag' not in st.session_state:
         st.session_state.analyze_flag = False
+    if 'rerun_app' not in st.session_state:
+        st.session_state.rerun_app = False
 
 # Initialize session state at the start
 init_session_state()
@@ -251,27 +395,65 @@ def select_stock(ticker, name):
     st.session_state.analyze_flag = True  # Set flag to trigger analysis
     # We'll use a different approach to reset the search
 
+# Function to handle a pick from the suggestions dropdown
+def on_suggestion_select():
+    choice = st.session_state.suggestion_choice
+    if choice:
+        symbol, name = choice
+        select_stock(symbol, name)
+        st.session_state.rerun_app = True  # Picks must reach the analysis outside the fragment
+
+# Reuse results of a shorter, already-fetched prefix when they still match
+# Only complete (non-truncated) results are cached, longest prefix wins
+def lookup_prefix_cache(query):
+    needle = query.upper()
+    for prefix in sorted(st.session_state.prefix_cache, key=len, reverse=True):
+        results = st.session_state.prefix_cache[prefix]
+        if needle.startswith(prefix):
+            matches = [
+                (symbol, name) for symbol, name in results
+                if needle in symbol.upper() or needle in name.upper()
+            ]
+            if matches:
+                return matches
+    return None
+
 # Add this function for handling search input changes
 def on_search_change():
     # Get the current query from the widget's value
-    query = st.session_state.search_query
+    # Upper-cased so "tcs", "TCS " and "TCS" share one cache entry
+    query = st.session_state.search_query.strip().upper()
     current_time = time.time()
     
+    if len(query) < MIN_QUERY_LENGTH:
+        st.session_state.suggestions = []
+        return
+    
+    # Narrow down results we already have before going to the network
+    cached = lookup_prefix_cache(query)
+    if cached is not None:
+        st.session_state.suggestions = cached
+        return
+    
     # Debounce the search
-    if current_time - st.session_state.last_search_time > 0.3 and len(query) >= 2:
-        st.session_state.suggestions = get_ticker_suggestions(query)
+    if current_time - st.session_state.last_search_time > 0.3:
+        try:
+            suggestions, complete = get_ticker_suggestions(query)
+        except Exception as e:
+            st.error(f"Error fetching suggestions: {e}")
+            suggestions, complete = [], False
+        st.session_state.suggestions = suggestions
+        if suggestions and complete:
+            st.session_state.prefix_cache[query] = suggestions
         st.session_state.last_search_time = current_time
-    elif len(query) < 2:
-        st.session_state.suggestions = []
 
 # Create a container for the search and suggestions
 search_container = st.container()
 
-# Remove the duplicate init_session_state call in the search container
-with search_container:
-    # Remove this line as we already initialized at the top
-    # init_session_state()
-    
+# Search and suggestions run as a fragment, so searching reruns only this part
+# instead of the whole script and chart
+@st.fragment
+def search_panel():
     # Search input with callback
     st.text_input(
         "Search for stock or index:",
@@ -279,26 +461,32 @@ with search_container:
         on_change=on_search_change
     )
     
-    # Display suggestions in a more compact way
+    # Display suggestions as a single dropdown rather than one button each
     if st.session_state.suggestions:
-        cols = st.columns(2)  # Create 2 columns for suggestions
-        for i, (symbol, name) in enumerate(st.session_state.suggestions[:8]):
-            col_idx = i % 2
-            with cols[col_idx]:
-                if st.button(
-                    f"{name} ({symbol})",
-                    key=f"suggestion_{i}",
-                    use_container_width=True,
-                    type="secondary"
-                ):
-                    # Don't try to modify search_query here
-                    select_stock(symbol, name)
-                    # Remove this line that's causing the error
-                    # st.session_state.search_query = ""
+        st.selectbox(
+            "Suggestions:",
+            options=st.session_state.suggestions[:8],
+            format_func=lambda option: f"{option[1]} ({option[0]})",
+            index=None,
+            placeholder="Pick a stock or index",
+            key="suggestion_choice",
+            on_change=on_suggestion_select
+        )
+
+    # A picked suggestion needs a full rerun to update the ticker and analysis
+    if st.session_state.rerun_app:
+        st.session_state.rerun_app = False
+        st.rerun()
+
+# Remove the duplicate init_session_state call in the search container
+with search_container:
+    # Remove this line as we already initialized at the top
+    # init_session_state()
+    search_panel()
 
 # Manual ticker input as a fallback
 manual_ticker = st.text_input(
-    "Or enter ticker symbol directly:", 
+    "Or enter ticker symbol directly (comma-separated for several):", 
     value=st.session_state.selected_ticker,
     key="manual_input"
 )
@@ -307,22 +495,22 @@ if manual_ticker and manual_ticker != st.session_state.selected_ticker:
     st.session_state.selected_ticker = manual_ticker
     st.session_state.analyze_flag = True
 
-# Determine which ticker to use
-final_ticker = ""
-if st.session_state.selected_ticker:
-    final_ticker = index_mapping.get(st.session_state.selected_ticker, st.session_state.selected_ticker)
-elif manual_ticker:
-    final_ticker = index_mapping.get(manual_ticker, manual_ticker)
-
-# Add .NS suffix for Indian stocks if needed
-if final_ticker and not any(x in final_ticker for x in ['.', '^']) and not final_ticker.endswith('.NS'):
-    final_ticker += ".NS"
+# Determine which ticker(s) to use
+raw_tickers = st.session_state.selected_ticker or manual_ticker
+final_tickers = [resolve_ticker(t.strip()) for t in raw_tickers.split(",") if t.strip()]
+final_tickers = list(dict.fromkeys(final_tickers))  # Drop duplicates, keep order
 
 # Analysis section
 analysis_container = st.container()
 
 # Check if we should analyze
-if st.session_state.analyze_flag and final_ticker:
+if st.session_state.analyze_flag and final_tickers:
     with analysis_container:
-        analyze_stock(final_ticker)
+        if len(final_tickers) == 1:
+            analyze_stock(final_tickers[0])
+        else:
+            with st.spinner(f"Downloading data for {len(final_tickers)} tickers..."):
+                histories = download_many(tuple(final_tickers))
+            for ticker in final_tickers:
+                analyze_stock(ticker, histories[ticker])
         st.session_state.analyze_flag = False  # Reset flag after analysis
\ No newline at end of file